@@ -0,0 +1 @@
+"""Code review a Git branch against main/master with a local or remote Ollama model."""
@@ -0,0 +1,115 @@
+"""Command line entry point: `review` runs a review, `review serve` keeps a warm daemon around."""
+
+import os
+import json
+import queue
+import atexit
+import socket
+import logging
+import argparse
+import socketserver
+from logging.handlers import QueueHandler, QueueListener
+
+from .config import SOCKET_PATH, validate_env_vars
+
+# Configure logging: threads only enqueue records, and a single listener thread writes them to stderr
+_log_queue = queue.SimpleQueue()
+_log_output = logging.StreamHandler()
+_log_output.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+_log_listener = QueueListener(_log_queue, _log_output)
+_log_enqueue = QueueHandler(_log_queue)
+# Merges the arguments into the message before the record is handed over; the listener adds the rest
+_log_enqueue.setFormatter(logging.Formatter('%(message)s'))
+logging.basicConfig(level=logging.INFO, handlers=[_log_enqueue])
+_log_listener.start()
+# Flush whatever is still queued on the way out, sys.exit included
+atexit.register(_log_listener.stop)
+
+def _pipeline():
+    """Import the review pipeline on demand, so handing a review to the daemon never loads GitPython or requests."""
+    from . import review
+    return review
+
+def request_review(path, branch=None):
+    """Ask a running `review serve` daemon to review path; return its reply, or None if none is listening."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(SOCKET_PATH)
+            sock.sendall(json.dumps({'path': path, 'branch': branch}).encode() + b'\n')
+            with sock.makefile('rb') as reply:
+                return json.loads(reply.read())
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"Review server did not answer, reviewing locally: {e}")
+        return None
+
+class ReviewRequestHandler(socketserver.StreamRequestHandler):
+    """Run one review per connection and reply with a single JSON object."""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            # A bare connect, e.g. another `review serve` checking whether we're up
+            return
+
+        pipeline = _pipeline()
+        try:
+            request = json.loads(line)
+            reply = {'report': pipeline.run_review(request['path'], request.get('branch'))}
+        except pipeline.ReviewError as e:
+            reply = {'error': str(e)}
+        except Exception as e:
+            logging.error(f"Error handling review request: {e}")
+            reply = {'error': f"Review server failed: {e}"}
+        self.wfile.write(json.dumps(reply).encode())
+
+def serve():
+    """Serve reviews over SOCKET_PATH, keeping the pipeline imported and the Ollama connection warm."""
+    _pipeline()
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        if probe.connect_ex(SOCKET_PATH) == 0:
+            logging.error(f"A review server is already listening on {SOCKET_PATH}")
+            return
+    if os.path.exists(SOCKET_PATH):
+        os.unlink(SOCKET_PATH)
+    os.makedirs(os.path.dirname(SOCKET_PATH), exist_ok=True)
+
+    with socketserver.UnixStreamServer(SOCKET_PATH, ReviewRequestHandler) as server:
+        os.chmod(SOCKET_PATH, 0o600)
+        logging.info(f"Serving reviews on {SOCKET_PATH}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(SOCKET_PATH)
+
+def main():
+    """Review the current branch against main/master, through the daemon when one is running."""
+    parser = argparse.ArgumentParser(prog='review', description="Code review a branch with Ollama against main/master.")
+    parser.add_argument('--branch', help="branch to review (default: the checked-out branch)")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('serve', help="keep a warm review server listening on a Unix socket")
+    args = parser.parse_args()
+
+    validate_env_vars()
+
+    if args.command == 'serve':
+        serve()
+        return
+
+    current_path = os.getcwd()
+    reply = request_review(current_path, args.branch)
+    if reply is None:
+        pipeline = _pipeline()
+        try:
+            reply = {'report': pipeline.run_review(current_path, args.branch)}
+        except pipeline.ReviewError as e:
+            reply = {'error': str(e)}
+
+    if 'error' in reply:
+        logging.error(reply['error'])
+    else:
+        logging.info(reply['report'])
@@ -0,0 +1,124 @@
+"""Settings read from the .env file and the bundled build config."""
+
+import os
+import sys
+import logging
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+from dotenv import load_dotenv
+
+# Load .env file
+if hasattr(sys, '_MEIPASS'):
+    # Running as a compiled binary
+    env_path = os.path.join(sys._MEIPASS, '.env')
+else:
+    # Running as a script
+    env_path = '.env'
+
+@dataclass(frozen=True)
+class Env:
+    """The environment variables the tool reads, as found after loading .env (None when unset)."""
+    OLLAMA_HOST: Optional[str] = None
+    OLLAMA_MODEL: Optional[str] = None
+    SSH_HOST: Optional[str] = None
+    SSH_USER: Optional[str] = None
+    SSH_PORT: Optional[str] = None
+    OLLAMA_CONCURRENCY: Optional[str] = None
+    OLLAMA_NUM_PARALLEL: Optional[str] = None
+    MAX_PROMPT_CHARS: Optional[str] = None
+    OLLAMA_NUM_CTX: Optional[str] = None
+    OLLAMA_NUM_PREDICT: Optional[str] = None
+    OLLAMA_KEEP_ALIVE: Optional[str] = None
+    DIFF_BACKEND: Optional[str] = None
+    OLLAMA_BATCH_FILES: Optional[str] = None
+
+def _load_env():
+    """Load the .env file and snapshot the variables the tool reads."""
+    load_dotenv(env_path)
+    return Env(**{field.name: os.getenv(field.name) for field in fields(Env)})
+
+# Read once at import; everything below derives from this snapshot
+ENV = _load_env()
+
+def _int_setting(default, *names, minimum=None):
+    """Parse the first set variable of names (or default) as an integer, clamped to minimum; exit on a bad value."""
+    name = next((name for name in names if getattr(ENV, name)), names[0])
+    value = getattr(ENV, name) or default
+    try:
+        number = int(value)
+    except ValueError:
+        logging.error(f"{name} must be a whole number in .env file (current: {value})")
+        sys.exit(1)
+    return number if minimum is None else max(minimum, number)
+
+# Get environment variables with defaults
+OLLAMA_HOST = ENV.OLLAMA_HOST or 'http://localhost:11434'
+# Q4_K_M quantization roughly halves weight bytes, and decode speed is memory-bound
+OLLAMA_MODEL = ENV.OLLAMA_MODEL or 'qwen2.5-coder:14b-instruct-q4_K_M'
+SSH_HOST = ENV.SSH_HOST or '192.168.31.18'
+SSH_USER = ENV.SSH_USER or 'roman'
+SSH_PORT = ENV.SSH_PORT or '22'
+# Match the server's own OLLAMA_NUM_PARALLEL; extra client threads would only queue on it
+OLLAMA_CONCURRENCY = _int_setting('2', 'OLLAMA_CONCURRENCY', 'OLLAMA_NUM_PARALLEL', minimum=1)
+MAX_PROMPT_CHARS = _int_setting('12000', 'MAX_PROMPT_CHARS', minimum=1)
+# Up to this many small diffs are reviewed together in one request (1, or anything lower, disables batching)
+OLLAMA_BATCH_FILES = _int_setting('1', 'OLLAMA_BATCH_FILES', minimum=1)
+OLLAMA_OPTIONS = {
+    'num_ctx': _int_setting('8192', 'OLLAMA_NUM_CTX', minimum=1),
+    # Left unclamped: Ollama reads -1 as "until the model stops"
+    'num_predict': _int_setting('512', 'OLLAMA_NUM_PREDICT')
+}
+# Keep the model resident between the per-file requests instead of reloading weights
+OLLAMA_KEEP_ALIVE = ENV.OLLAMA_KEEP_ALIVE or '30m'
+
+# 'gitpython' diffs through GitPython's persistent git process; 'numstat' lists
+# changes with --numstat and only asks git for the patches of admitted files
+DIFF_BACKEND = ENV.DIFF_BACKEND or 'gitpython'
+
+# Diffs larger than this are skipped rather than reviewed
+MAX_DIFF_BYTES = 500_000
+
+# Reviews are cached by (model, options, prompt) so unchanged diffs skip Ollama on re-runs
+CACHE_DIR = Path(os.getenv('XDG_CACHE_HOME') or Path.home() / '.cache') / 'ai-code-review'
+
+# Unix socket the `review serve` daemon listens on
+SOCKET_PATH = str(CACHE_DIR / 'review.sock')
+
+# One multiplexed SSH control socket per user@host:port (%C is ssh's hash of them). It lives in
+# our per-user cache dir, not /tmp, so no other local user can plant a socket there first
+SSH_CONTROL_PATH = str(CACHE_DIR / 'ssh-%C')
+
+@lru_cache(maxsize=1)
+def get_config_mode():
+    """Get the mode (ssh/http) baked in at build time, or from config.txt when run as a script."""
+    try:
+        # Generated by gen_config.py and bundled into the compiled binary
+        from config_py import CONFIG
+        return CONFIG.get('MODE', 'http')
+    except ImportError:
+        pass
+
+    try:
+        with open('config.txt', 'r') as f:
+            for line in f:
+                if line.startswith('MODE='):
+                    return line.strip().split('=')[1]
+    except Exception:
+        return 'http'  # Default to http mode if config file not found
+    return 'http'
+
+@lru_cache(maxsize=1)
+def validate_env_vars():
+    """Validate environment variables."""
+    required_vars = ['OLLAMA_HOST', 'OLLAMA_MODEL']
+    if get_config_mode() == 'ssh':
+        required_vars.extend(['SSH_HOST', 'SSH_USER', 'SSH_PORT'])
+    
+    missing_vars = [var for var in required_vars if not getattr(ENV, var)]
+    if missing_vars:
+        logging.error("Please set the following required environment variables in .env file:")
+        for var in missing_vars:
+            logging.error(f"{var} (current: {getattr(ENV, var)})")
+        sys.exit(1)
@@ -0,0 +1,278 @@
+"""Reading branch diffs and file context out of the Git repository."""
+
+import os
+import logging
+import mmap
+import re
+from git import Repo
+from git.exc import BadName, GitCommandError, InvalidGitRepositoryError, NoSuchPathError
+
+from .config import DIFF_BACKEND, MAX_DIFF_BYTES, MAX_PROMPT_CHARS
+
+# Changes that cost tokens without giving the model anything worth reviewing
+_SKIP_PATH_RE = re.compile(r'(-lock\.json|\.lock|\.min\.(js|css)|\.svg|\.png)$')
+# Per-file header of a unified diff; the b/ side names the file after the change. Git wraps
+# a path in double quotes and C escapes when it holds a tab, newline, quote or backslash
+_DIFF_HEADER_RE = re.compile(r'^diff --git (?:a/.*|"a/.*") ("b/.*"|b/.*)$', re.M)
+# Escapes git uses inside a quoted path: octal bytes and the usual C ones
+_QUOTED_ESCAPE_RE = re.compile(rb'\\([0-7]{3}|.)')
+_C_ESCAPES = {b'a': b'\a', b'b': b'\b', b't': b'\t', b'n': b'\n', b'v': b'\v', b'f': b'\f', b'r': b'\r'}
+# Keeps the git diff argv well under the OS command line limit
+_PATHS_PER_DIFF = 200
+
+# Zero-width split point in front of every hunk header
+_HUNK_RE = re.compile(r'^(?=@@ )', re.M)
+# Hunk header: old start, new start and the trailing section heading
+_HUNK_HEADER_RE = re.compile(r'^@@ -(\d+)(?:,\d+)? \+(\d+)(?:,\d+)? @@(.*)$')
+
+# Python import statements at the start of a line, matched straight off the file's bytes
+IMPORT_RE = re.compile(rb'(?m)^(?:import|from)[ \t]+[^\n]+')
+
+# Repos opened so far by this process, keyed by their top-level directory
+_repos = {}
+
+def _find_toplevel(path):
+    """The nearest directory at or above path that holds a .git entry, found with stat calls alone."""
+    path = os.path.realpath(path)
+    while not os.path.exists(os.path.join(path, '.git')):
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+    return path
+
+def open_repo(path):
+    """Open the Git repository containing path, or return None if there isn't one."""
+    # A long-running `review serve` keeps one Repo, and its git processes, per repository between reviews,
+    # whichever subdirectory each review is started from
+    repo = _repos.get(_find_toplevel(path))
+    if repo is not None and os.path.isdir(repo.git_dir):
+        return repo
+    try:
+        fresh = Repo(path, search_parent_directories=True)
+    except (InvalidGitRepositoryError, NoSuchPathError):
+        return None
+    if repo is not None:
+        repo.close()
+    _repos[os.path.realpath(fresh.working_tree_dir or fresh.git_dir)] = fresh
+    return fresh
+
+def get_current_branch(repo):
+    """Get the name of the current active branch."""
+    return repo.active_branch.name
+
+def get_generated_paths(repo, paths):
+    """Return the paths marked linguist-generated in .gitattributes, in one git call per batch of paths."""
+    generated = set()
+    # Batched like the numstat diffs, so a huge branch can't push the argv past the OS limit
+    for start in range(0, len(paths), _PATHS_PER_DIFF):
+        try:
+            # -z prints NUL-separated path, attribute, value triples with the paths unquoted
+            output = repo.git.check_attr('-z', 'linguist-generated', '--', *paths[start:start + _PATHS_PER_DIFF])
+        except GitCommandError as e:
+            logging.warning(f"Could not read .gitattributes: {e}")
+            return set()
+
+        fields = output.split('\0')
+        generated.update(fields[i] for i in range(0, len(fields) - 2, 3) if fields[i + 2] in ('set', 'true'))
+    return generated
+
+def skip_reason(path, generated_paths, binary=False, size=0, diff=None):
+    """Explain why a changed file isn't worth reviewing, or return None to review it."""
+    if binary:
+        return "binary"
+    if _SKIP_PATH_RE.search(path):
+        return "lockfile, minified or image"
+    if path in generated_paths:
+        return "generated"
+    if size > MAX_DIFF_BYTES:
+        return "diff too large"
+    if diff is not None and is_cosmetic_change(diff):
+        return "whitespace or rename only"
+    return None
+
+def is_cosmetic_change(diff):
+    """Whether a file diff has no hunks (a pure rename or mode change) or only touches blank lines and trailing whitespace."""
+    _, *hunks = split_into_hunks(diff)
+    for hunk in hunks:
+        # Compare each run of -/+ lines on its own, so a line moved past context still counts as a change
+        removed, added = [], []
+        for line in hunk.splitlines()[1:] + [' ']:
+            # Leading whitespace is left alone; it is significant in Python and YAML
+            content = line[1:].rstrip()
+            if line.startswith('-'):
+                if content:
+                    removed.append(content)
+            elif line.startswith('+'):
+                if content:
+                    added.append(content)
+            elif not line.startswith('\\'):
+                if removed != added:
+                    return False
+                removed, added = [], []
+    return True
+
+def compare_branches(repo, branch1, branch2):
+    """Get the diff between two branches as a dictionary of file paths and their diffs."""
+    if DIFF_BACKEND == 'numstat':
+        return compare_branches_numstat(repo, branch1, branch2)
+
+    try:
+        # One in-process diff-tree over the already-open Repo, streamed and parsed per file;
+        # three lines of context keeps prompt sizes (and cache keys) independent of git defaults
+        diff_index = repo.commit(branch1).diff(branch2, create_patch=True, unified=3)
+    except (BadName, GitCommandError) as e:
+        logging.error(f"Error generating git diff: {e}")
+        return {}
+
+    generated_paths = get_generated_paths(repo, [d.b_path or d.a_path for d in diff_index])
+
+    file_diffs = {}
+    for d in diff_index:
+        path = d.b_path or d.a_path
+        binary = d.diff.startswith(b'Binary files')
+        diff = None if binary else d.diff.decode('utf-8', 'replace')
+        reason = skip_reason(path, generated_paths, binary=binary, size=len(d.diff), diff=diff)
+        if reason:
+            line_count = d.diff.count(b'\n')
+            logging.info("Skipping %s (%s, %d diff lines)", path, reason, line_count)
+            continue
+        a_path = "/dev/null" if d.new_file else f"a/{d.a_path}"
+        b_path = "/dev/null" if d.deleted_file else f"b/{d.b_path}"
+        file_diffs[path] = f"--- {a_path}\n+++ {b_path}\n" + diff
+    
+    return file_diffs
+
+def compare_branches_numstat(repo, branch1, branch2):
+    """Like compare_branches, but filter on one --numstat listing before asking git for any patch text."""
+    revision = f"{branch1}..{branch2}"
+    try:
+        # -z leaves paths unquoted, so they can be passed straight back as pathspecs
+        numstat = repo.git.diff('--numstat', '-z', '--no-renames', revision)
+    except GitCommandError as e:
+        logging.error(f"Error listing changed files: {e}")
+        return {}
+
+    changes = [record.split('\t', 2) for record in numstat.split('\0') if record]
+    generated_paths = get_generated_paths(repo, [path for _, _, path in changes])
+
+    files = []
+    for added, deleted, path in changes:
+        # Binary files are listed with '-' in place of line counts
+        binary = added == '-'
+        reason = skip_reason(path, generated_paths, binary=binary)
+        if reason:
+            line_count = 0 if binary else int(added) + int(deleted)
+            logging.info("Skipping %s (%s, %d changed lines)", path, reason, line_count)
+            continue
+        files.append(path)
+
+    # One git diff per batch of admitted paths rather than one process per file
+    file_diffs = {}
+    for start in range(0, len(files), _PATHS_PER_DIFF):
+        try:
+            # Keep non-ASCII names unquoted in the headers, and don't read names like '*.py' as globs
+            raw_diff = repo.git(c='core.quotePath=false', literal_pathspecs=True).diff(
+                '--no-renames', revision, '--', *files[start:start + _PATHS_PER_DIFF]
+            )
+        except GitCommandError as e:
+            logging.error(f"Error generating git diff: {e}")
+            continue
+        for path, diff in split_unified_diff(raw_diff).items():
+            reason = skip_reason(path, generated_paths, size=len(diff), diff=diff)
+            if reason:
+                line_count = diff.count('\n')
+                logging.info("Skipping %s (%s, %d diff lines)", path, reason, line_count)
+                continue
+            file_diffs[path] = diff
+
+    return file_diffs
+
+def split_unified_diff(raw_diff):
+    """Split a multi-file unified diff on its 'diff --git' headers, keyed by the b/ path."""
+    headers = list(_DIFF_HEADER_RE.finditer(raw_diff))
+    file_diffs = {}
+    for i, header in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(raw_diff)
+        file_diffs[_unquote_path(header.group(1))[2:]] = raw_diff[header.start():end]
+    return file_diffs
+
+def _unquote_path(path):
+    """Undo git's C-style quoting of a path, e.g. '"caf\\303\\251.py"'; unquoted paths come back as they are."""
+    if not (len(path) > 1 and path.startswith('"') and path.endswith('"')):
+        return path
+    def unescape(match):
+        escape = match.group(1)
+        return bytes([int(escape, 8)]) if len(escape) == 3 else _C_ESCAPES.get(escape, escape)
+    return _QUOTED_ESCAPE_RE.sub(unescape, path[1:-1].encode()).decode('utf-8', 'replace')
+
+def split_into_hunks(file_diff):
+    """Split a file diff into its header followed by each '@@' hunk."""
+    return _HUNK_RE.split(file_diff)
+
+def split_hunk(hunk, max_chars):
+    """Cut a hunk longer than max_chars into line-aligned sub-hunks, each with its own renumbered '@@' header."""
+    header, _, body = hunk.partition('\n')
+    match = _HUNK_HEADER_RE.match(header)
+    if len(hunk) <= max_chars or not match:
+        return [hunk]
+
+    old_line, new_line, section = int(match[1]), int(match[2]), match[3]
+    # Renumbered headers can come out a few digits longer than the original
+    budget = max_chars - len(header) - 16
+    pieces, current, size = [], [], 0
+    lines = body.splitlines(keepends=True)
+    for index, line in enumerate(lines):
+        current.append(line)
+        size += len(line)
+        if index + 1 < len(lines) and (size + len(lines[index + 1]) <= budget or lines[index + 1].startswith('\\')):
+            # '\ No newline at end of file' stays with the line it annotates
+            continue
+        old_count = sum(1 for l in current if not l.startswith(('+', '\\')))
+        new_count = sum(1 for l in current if not l.startswith(('-', '\\')))
+        pieces.append(f"@@ -{old_line},{old_count} +{new_line},{new_count} @@{section}\n" + ''.join(current))
+        old_line, new_line = old_line + old_count, new_line + new_count
+        current, size = [], 0
+    return pieces
+
+def batch_hunks(file_diff, max_chars=None):
+    """Group a file diff's hunks into chunks of at most max_chars, each keeping the file header."""
+    max_chars = max_chars or MAX_PROMPT_CHARS
+    if len(file_diff) <= max_chars:
+        return [file_diff]
+
+    header, *hunks = split_into_hunks(file_diff)
+    # A single hunk over the limit would otherwise still go out as one oversized prompt
+    hunks = [piece for hunk in hunks for piece in split_hunk(hunk, max_chars - len(header))]
+    batches = []
+    current, size = [header], len(header)
+    for hunk in hunks:
+        if len(current) > 1 and size + len(hunk) > max_chars:
+            batches.append(''.join(current))
+            current, size = [header], len(header)
+        current.append(hunk)
+        size += len(hunk)
+    batches.append(''.join(current))
+    return batches
+
+def get_file_context(file_path):
+    """Extract context about a file, such as imported modules or dependencies."""
+    try:
+        with open(file_path, 'rb') as f:
+            # Example: Extract imports for Python files
+            if file_path.endswith('.py'):
+                return {"imports": scan_imports(f), "file_type": "Python"}
+
+        # Add more file type handlers here (e.g., JavaScript, Java, etc.)
+        return {"file_type": "Unknown"}
+    except Exception as e:
+        logging.error(f"Error reading file {file_path}: {e}")
+        return {}
+
+def scan_imports(f):
+    """Return the import lines of an open binary file via one regex pass over a read-only mmap."""
+    if not f.seek(0, 2):
+        # mmap refuses to map an empty file
+        return []
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return [m.decode('utf-8', 'replace').strip() for m in IMPORT_RE.findall(data)]
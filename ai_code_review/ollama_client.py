@@ -0,0 +1,325 @@
+"""Talking to the Ollama server: SSH tunnel, connection check, prompts and the review cache."""
+
+import hashlib
+import logging
+import random
+import re
+import shutil
+import socket
+import subprocess
+import time
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from .config import (
+    CACHE_DIR, OLLAMA_CONCURRENCY, OLLAMA_HOST, OLLAMA_KEEP_ALIVE, OLLAMA_MODEL, OLLAMA_OPTIONS,
+    SSH_CONTROL_PATH, SSH_HOST, SSH_PORT, SSH_USER
+)
+
+# Shared session so calls to Ollama reuse the same keep-alive connections.
+# The pool is sized past OLLAMA_CONCURRENCY so no worker's connection gets
+# discarded and re-opened on the next file. Transient server errors are retried
+# with backoff, including on the POST used for reviews; raise_on_status leaves
+# the final error response for the caller. Timeouts are left to post_chat's own
+# jittered loop: read=False re-raises a read timeout as requests' ReadTimeout
+# instead of silently re-sending the generation, and connect=0 hands connect
+# timeouts straight back as ConnectTimeout.
+OLLAMA_RETRIES = 4
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=max(32, OLLAMA_CONCURRENCY + 1),
+    max_retries=Retry(
+        total=OLLAMA_RETRIES,
+        backoff_factor=0.8,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['GET', 'POST'],
+        read=False,
+        connect=0,
+        raise_on_status=False
+    )
+)
+SESSION.mount('http://', _adapter)
+SESSION.mount('https://', _adapter)
+
+# Static review instructions, sent as the chat system message so Ollama can reuse its prefill
+SYSTEM_PROMPT = (
+    "Your ONLY purpose is to analyze Git diff output for issues. You are a strict issue detector that CANNOT provide any other type of response.\n\n"
+    "YOU MUST ONLY OUTPUT IN THIS FORMAT:\n"
+    "1. Issue: [One line description]\n"
+    "Severity: [ONLY use: Trivial/Medium/Severe]\n"
+    "What is happening: [Brief explanation]\n"
+    "How to fix: [Brief solution]\n\n"
+    "OR IF NO ISSUES:\n"
+    "No issues found\n\n"
+    "CRITICAL RULES:\n"
+    "- NO markdown\n"
+    "- NO summaries\n"
+    "- NO explanations\n"
+    "- NO additional text\n"
+    "- NO analysis outside of the strict format\n"
+    "- NO documentation\n"
+    "- NO suggestions beyond issue format\n"
+    "- NO other response types allowed\n"
+    "- NEVER deviate from format\n\n"
+    "FORBIDDEN RESPONSES (DO NOT OUTPUT LIKE THESE):\n"
+    "❌ 'Here's a summary of changes...'\n"
+    "❌ 'The provided diff shows...'\n"
+    "❌ 'Key modifications include...'\n"
+    "❌ Any markdown formatting\n"
+    "❌ Any high-level analysis"
+)
+
+# The whole reply the prompt asks for when a diff is clean
+NO_ISSUES = "No issues found"
+
+# Marker line separating files when several small diffs share one request
+_FILE_MARKER_RE = re.compile(r'^=====FILE: (.+?)=====[ \t]*$', re.M)
+
+# Everything in the chat request except the user message is fixed for the run,
+# so it is JSON-encoded once here and each request only encodes its own prompt
+_CHAT_BODY_PREFIX = (
+    orjson.dumps({'model': OLLAMA_MODEL, 'stream': True, 'keep_alive': OLLAMA_KEEP_ALIVE, 'options': OLLAMA_OPTIONS})[:-1]
+    + b', "messages": [' + orjson.dumps({'role': 'system', 'content': SYSTEM_PROMPT})
+    + b', {"role": "user", "content": '
+)
+_CHAT_BODY_SUFFIX = b'}]}'
+
+# Local end of the SSH port forward to the remote Ollama
+TUNNEL_PORT = 11434
+
+# A successful version check is trusted for this many seconds, so quick re-runs skip the round trip;
+# the marker's mtime records it, one marker per OLLAMA_HOST
+ALIVE_TTL = 30
+_ALIVE_MARKER = CACHE_DIR / f"alive-{hashlib.sha256(OLLAMA_HOST.encode()).hexdigest()[:16]}"
+
+def _ssh_target():
+    """Common ssh arguments addressing the Ollama server through the shared control socket."""
+    return ["-o", f"ControlPath={SSH_CONTROL_PATH}", f"{SSH_USER}@{SSH_HOST}", "-p", SSH_PORT]
+
+def _port_in_use(port):
+    """Whether something on this machine already accepts connections on port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.settimeout(0.1)
+        return sock.connect_ex(('127.0.0.1', port)) == 0
+
+def setup_ssh_tunnel():
+    """Setup SSH tunnel to the Ollama server, reusing a live control master if there is one."""
+    # Resolved once here so both calls exec ssh directly, and a missing client is reported as such
+    ssh = shutil.which("ssh")
+    if ssh is None:
+        logging.error("ssh mode needs the OpenSSH client, but no ssh executable was found on PATH.")
+        return False
+
+    try:
+        # ssh creates the control socket but not the directory holding it
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        check = subprocess.run([ssh, "-O", "check", *_ssh_target()], stderr=subprocess.PIPE)
+        if check.returncode == 0:
+            logging.info("Reusing existing SSH tunnel.")
+            return True
+
+        # No tunnel of ours is up, so anything holding the port belongs to someone else; leave it alone
+        if _port_in_use(TUNNEL_PORT):
+            logging.error(f"Port {TUNNEL_PORT} is already in use by another process; free it to use ssh mode.")
+            return False
+
+        cmd = [
+            ssh, "-M", "-f", "-N",
+            "-o", "ControlMaster=auto",
+            "-o", "ControlPersist=600",
+            "-o", "ExitOnForwardFailure=yes",
+            "-L", f"{TUNNEL_PORT}:localhost:{TUNNEL_PORT}",
+            *_ssh_target()
+        ]
+        result = subprocess.run(cmd, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            logging.error(f"Failed to create SSH tunnel: {result.stderr.decode()}")
+            return False
+        # ssh -f returns once authenticated; give the forward up to 2s to start accepting
+        for _ in range(20):
+            if _port_in_use(TUNNEL_PORT):
+                break
+            time.sleep(0.1)
+        return True
+    except Exception as e:
+        logging.error(f"Error setting up SSH tunnel: {e}")
+        return False
+
+def ollama_is_reachable():
+    """Check that the Ollama HTTP API answers, trusting a success from the last ALIVE_TTL seconds."""
+    try:
+        if _ALIVE_MARKER.stat().st_mtime > time.time() - ALIVE_TTL:
+            return True
+    except OSError:
+        pass
+
+    try:
+        # Short, so a stalled server fails the run quickly instead of hanging it
+        response = SESSION.get(f"{OLLAMA_HOST}/api/version", timeout=5)
+    except requests.exceptions.RequestException:
+        return False
+    if response.status_code != 200:
+        return False
+
+    try:
+        _ALIVE_MARKER.parent.mkdir(parents=True, exist_ok=True)
+        _ALIVE_MARKER.touch()
+    except OSError as e:
+        logging.warning(f"Could not record Ollama liveness: {e}")
+    return True
+
+def build_prompt(diff_output, filename=None, context=None):
+    """Build the per-file user message; the review rules live in SYSTEM_PROMPT."""
+    file_context = f"File: {filename}\n" if filename else ""
+    if context:
+        file_context += f"Context: {orjson.dumps(context, option=orjson.OPT_INDENT_2).decode()}\n"
+    
+    return (
+        f"{file_context}"
+        "Here is the git diff to analyze:\n"
+        f"{diff_output}"
+    )
+
+def build_batch_prompt(entries):
+    """Build one user message covering several small (filename, diff, context) entries."""
+    sections = [
+        "Several files follow, each introduced by a line of the form =====FILE: <path>=====.\n"
+        "Start the findings for each file with that same marker line, then use the required format.\n"
+    ]
+    for filename, diff_output, context in entries:
+        sections.append(f"=====FILE: {filename}=====\n" + build_prompt(diff_output, filename, context))
+    return "\n".join(sections)
+
+def split_batch_review(review):
+    """Split a batched review back into {filename: findings} on its =====FILE: markers."""
+    parts = _FILE_MARKER_RE.split(review)
+    return {parts[i].strip(): parts[i + 1].strip() for i in range(1, len(parts) - 1, 2)}
+
+def build_request_body(prompt):
+    """Encode a chat request for prompt around the pre-encoded static fields."""
+    return _CHAT_BODY_PREFIX + orjson.dumps(prompt) + _CHAT_BODY_SUFFIX
+
+# Cache keys all start with the model, the system prompt and the generation options (a reply cut
+# short by num_predict mustn't outlive a higher limit); hash that prefix once and copy it per key
+_CACHE_KEY_HEAD = hashlib.sha256(f"{OLLAMA_MODEL}\0{SYSTEM_PROMPT}\0".encode() + orjson.dumps(OLLAMA_OPTIONS) + b"\0")
+
+def _cache_path(prompt):
+    """Content-addressed cache location for a prompt sent to the configured model."""
+    key = _CACHE_KEY_HEAD.copy()
+    key.update(prompt.encode())
+    return CACHE_DIR / key.hexdigest()
+
+def get_cached_review(prompt):
+    """Return the stored review for this exact prompt and model, or None."""
+    try:
+        return _cache_path(prompt).read_text()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logging.warning(f"Could not read review cache: {e}")
+        return None
+
+def store_cached_review(prompt, review):
+    """Persist a review so re-running on an unchanged diff skips Ollama."""
+    if not review:
+        return
+    path = _cache_path(prompt)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(review)
+    except OSError as e:
+        logging.warning(f"Could not write review cache: {e}")
+
+def warm_up_model():
+    """Ask Ollama to load the model now so the first file review doesn't pay the cold start."""
+    try:
+        response = SESSION.post(
+            f'{OLLAMA_HOST}/api/generate',
+            data=orjson.dumps({
+                'model': OLLAMA_MODEL,
+                'prompt': 'ok',
+                'stream': False,
+                'keep_alive': OLLAMA_KEEP_ALIVE,
+                # Same num_ctx as the chat requests, or Ollama reloads the runner for the first review
+                'options': {**OLLAMA_OPTIONS, 'num_predict': 1}
+            }),
+            headers={'Content-Type': 'application/json'},
+            timeout=60
+        )
+        if response.status_code != 200:
+            logging.warning(f"Model warmup failed: {response.text}")
+    except requests.exceptions.RequestException as e:
+        logging.warning(f"Model warmup failed: {e}")
+
+def post_chat(body):
+    """POST a chat request, retrying timeouts with exponential backoff and jitter."""
+    for attempt in range(OLLAMA_RETRIES + 1):
+        try:
+            return SESSION.post(
+                f'{OLLAMA_HOST}/api/chat',
+                data=body,
+                headers={'Content-Type': 'application/json'},
+                stream=True,
+                timeout=360
+            )
+        except requests.exceptions.Timeout:
+            if attempt == OLLAMA_RETRIES:
+                raise
+            delay = 2 ** attempt + random.random()
+            logging.warning("Ollama request timed out, retrying in %.1fs...", delay)
+            time.sleep(delay)
+
+def review_prompt(combined_prompt, label=None, stop_at_verdict=False):
+    """Process one file diff (or batch of diffs) with Ollama, or serve it from the cache; stop_at_verdict ends the stream at a bare NO_ISSUES first line."""
+    logging.info("Processing diff for %s (length: %d)", label, len(combined_prompt))
+
+    cached = get_cached_review(combined_prompt)
+    if cached is not None:
+        logging.info("Using cached review for %s", label)
+        return cached
+
+    logging.info("Sending prompt to Ollama for %s...", label)
+
+    try:
+        response = post_chat(build_request_body(combined_prompt))
+
+        with response:
+            if response.status_code != 200:
+                logging.error("Error response body: %s", response.text)
+                return ""
+
+            # Ollama streams one JSON object per line until 'done' is set
+            parts = []
+            verdict_checked = not stop_at_verdict
+            for raw in response.iter_lines():
+                if not raw:
+                    continue
+                chunk = orjson.loads(raw)
+                if 'error' in chunk:
+                    logging.error("Ollama returned an error: %s", chunk['error'])
+                    return ""
+                parts.append(chunk.get('message', {}).get('content', ''))
+                if chunk.get('done'):
+                    break
+                if not verdict_checked:
+                    head = ''.join(parts).lstrip()
+                    if len(head) > len(NO_ISSUES):
+                        verdict_checked = True
+                        if head.startswith(NO_ISSUES + '\n'):
+                            # For a single file anything after the verdict is noise; closing the stream stops the generation
+                            parts = [NO_ISSUES]
+                            break
+
+        result = ''.join(parts).strip()
+        store_cached_review(combined_prompt, result)
+        return result
+        
+    except requests.exceptions.Timeout:
+        logging.error("Ollama processing timed out for %s.", label)
+        return ""
+    except Exception:
+        logging.exception("Ollama call failed for %s", label)
+        return ""
@@ -0,0 +1,166 @@
+"""The review pipeline: diff the branch against main/master and collect Ollama's findings."""
+
+import os
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+from .config import MAX_PROMPT_CHARS, OLLAMA_BATCH_FILES, OLLAMA_CONCURRENCY, OLLAMA_HOST, OLLAMA_MODEL, get_config_mode
+from .git_io import batch_hunks, compare_branches, get_current_branch, get_file_context, open_repo
+from .ollama_client import (
+    NO_ISSUES, build_batch_prompt, build_prompt, get_cached_review, ollama_is_reachable, review_prompt, setup_ssh_tunnel,
+    split_batch_review, warm_up_model
+)
+
+# Threads reading changed files for prompt context; this is disk IO, not Ollama load
+CONTEXT_READERS = 8
+
+class ReviewError(Exception):
+    """Raised when a review can't run at all (no Ollama, no repository)."""
+
+def plan_requests(repo, file_diffs):
+    """Turn the file diffs into (prompt, label, targets) requests, each target a (filename, chunk index)."""
+    # Read the working-tree files for context concurrently instead of one blocking read after another
+    paths = [os.path.join(repo.working_tree_dir, filename) for filename in file_diffs]
+    with ThreadPoolExecutor(max_workers=CONTEXT_READERS) as executor:
+        contexts = dict(zip(file_diffs, executor.map(get_file_context, paths)))
+
+    planned = []
+    small_files = []
+    for filename, diff in file_diffs.items():
+        context = contexts[filename]
+        chunks = batch_hunks(diff)
+        if OLLAMA_BATCH_FILES > 1 and len(chunks) == 1 and len(diff) <= MAX_PROMPT_CHARS // OLLAMA_BATCH_FILES:
+            small_files.append((filename, diff, context))
+            continue
+        # Large diffs are reviewed in hunk batches
+        for index, chunk in enumerate(chunks):
+            planned.append((build_prompt(chunk, filename, context), filename, [(filename, index)]))
+
+    # Several small diffs share one request so the model is prompted once for all of them
+    for start in range(0, len(small_files), OLLAMA_BATCH_FILES):
+        entries = small_files[start:start + OLLAMA_BATCH_FILES]
+        names = [filename for filename, _, _ in entries]
+        if len(entries) == 1:
+            filename, diff, context = entries[0]
+            planned.append((build_prompt(diff, filename, context), filename, [(filename, 0)]))
+        else:
+            planned.append((build_batch_prompt(entries), ", ".join(names), [(name, 0) for name in names]))
+    return planned
+
+def store_review(reviews, label, targets, review):
+    """File a review under its targets, splitting batched reviews back up per file."""
+    if len(targets) == 1:
+        filename, index = targets[0]
+        reviews[filename][index] = review
+        return
+
+    sections = split_batch_review(review or "")
+    if not sections and review and review.strip() != NO_ISSUES:
+        # The model ignored the file markers; keep its findings under the whole batch
+        reviews[label] = {0: review}
+        return
+    for filename, index in targets:
+        reviews[filename][index] = sections.pop(filename, None)
+
+    # Markers that don't name a batched file exactly (e.g. './a.py') still carry findings; keep them under the batch
+    unmatched = [f"{name}:\n{text}" for name, text in sections.items() if text and text != NO_ISSUES]
+    if unmatched:
+        reviews[label] = {0: "\n---\n".join(unmatched)}
+
+def review_files(repo, file_diffs):
+    """Review each file diff and return the report entries for files with issues."""
+    # reviews[filename][chunk index] -> review text
+    reviews = {filename: {} for filename in file_diffs}
+
+    # Serve unchanged prompts from the cache so only misses go to Ollama
+    pending = []
+    for prompt, label, targets in plan_requests(repo, file_diffs):
+        cached = get_cached_review(prompt)
+        if cached is None:
+            pending.append((prompt, label, targets))
+        else:
+            logging.info("Using cached review for %s", label)
+            store_review(reviews, label, targets, cached)
+
+    if pending:
+        # Start loading the model while the first requests are sent; a fully cached run doesn't touch it
+        threading.Thread(target=warm_up_model, daemon=True).start()
+
+    # Bounded so we don't queue more requests than the Ollama server can serve
+    with ThreadPoolExecutor(max_workers=OLLAMA_CONCURRENCY) as executor:
+        future_to_request = {
+            executor.submit(review_prompt, prompt, label, stop_at_verdict=len(targets) == 1): (label, targets)
+            for prompt, label, targets in pending
+        }
+        for future in as_completed(future_to_request):
+            label, targets = future_to_request[future]
+            try:
+                store_review(reviews, label, targets, future.result())
+            except Exception as e:
+                logging.error("Error processing %s: %s", label, e)
+
+    all_results = []
+    for filename, chunk_reviews in reviews.items():
+        issues = [r for _, r in sorted(chunk_reviews.items()) if r and r.strip() != NO_ISSUES]
+        if issues:
+            all_results.append(f"\nFile: {filename}\n" + "\n---\n".join(issues))
+    return all_results
+
+def connect_to_ollama():
+    """Make sure Ollama is reachable in the configured mode, or raise ReviewError."""
+    mode = get_config_mode()
+    if mode == 'ssh':
+        if not setup_ssh_tunnel():
+            raise ReviewError("Failed to setup SSH tunnel. Exiting.")
+    elif not ollama_is_reachable():
+        raise ReviewError(f"Cannot connect to Ollama server at {OLLAMA_HOST}")
+
+    logging.info(f"Using Ollama model: {OLLAMA_MODEL} in {mode} mode")
+
+def check_in_background(check):
+    """Run check on a daemon thread and return a Future for its outcome; an exiting process never waits on it."""
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(check())
+        except Exception as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+def run_review(path, branch=None):
+    """Review branch (default: the checked-out one) of the repository at path and return the report text."""
+    # The http version check is network latency; overlap it with reading the repository. The ssh tunnel
+    # can prompt for a passphrase and outlives the run, so it only comes up once there is something to review
+    connection = None if get_config_mode() == 'ssh' else check_in_background(connect_to_ollama)
+
+    repo = open_repo(path)
+    if repo is None:
+        raise ReviewError("Not a git repository.")
+
+    current_branch = branch or get_current_branch(repo)
+    main_branch = "main" if "main" in repo.heads else "master"
+
+    if current_branch == main_branch:
+        return f"You are already on the {main_branch} branch."
+
+    logging.info(f"Comparing {current_branch} with {main_branch}...")
+    file_diffs = compare_branches(repo, main_branch, current_branch)
+
+    if not file_diffs:
+        return "No differences found."
+
+    if connection is None:
+        connect_to_ollama()
+    else:
+        connection.result()
+
+    logging.info("\nAnalyzing changes in each file:")
+    all_results = review_files(repo, file_diffs)
+
+    if all_results:
+        return "\nOllama Analysis Report:\n" + "\n".join(all_results)
+    return "\nOllama Analysis Report:\nNo issues found in any of the changed files."
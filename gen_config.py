@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+
+# Bake config.txt into an importable module so the bundled binary doesn't have to read it at runtime
+
+import sys
+
+def read_config(path):
+    """Parse KEY=VALUE lines from the config file."""
+    config = {}
+    with open(path, 'r') as f:
+        for line in f:
+            key, sep, value = line.strip().partition('=')
+            if sep:
+                config[key] = value
+    return config
+
+def main():
+    """Write CONFIG as a Python dict literal to the generated module."""
+    source = sys.argv[1] if len(sys.argv) > 1 else 'config.txt'
+    target = sys.argv[2] if len(sys.argv) > 2 else 'config_py.py'
+    with open(target, 'w') as f:
+        f.write("# Generated by gen_config.py at build time. Do not edit.\n")
+        f.write(f"CONFIG = {read_config(source)!r}\n")
+
+if __name__ == "__main__":
+    main()
@@ -25,8 +25,9 @@ while getopts "m:" opt; do
   esac
 done
 
-# Create a temporary config file that will be bundled
+# Create a temporary config file and bake it into a module that will be bundled
 echo "MODE=$MODE" > config.txt
+python3 gen_config.py config.txt config_py.py
 
 # Check if pyinstaller is installed
 if ! command -v pyinstaller &> /dev/null; then
@@ -36,7 +37,7 @@ fi
 
 # Step 1: Compile the Python script into an executable
 echo "Compiling the script with PyInstaller in $MODE mode..."
-pyinstaller --onefile --name "$EXECUTABLE_NAME" --add-data ".env:." --add-data "config.txt:." "$SCRIPT_NAME"
+pyinstaller --onefile --name "$EXECUTABLE_NAME" --add-data ".env:." --hidden-import config_py "$SCRIPT_NAME"
 
 # Step 2: Check if the compilation succeeded
 if [ ! -f "dist/$EXECUTABLE_NAME" ]; then
@@ -50,7 +51,7 @@ sudo mv "dist/$EXECUTABLE_NAME" "$DESTINATION"
 
 # Step 4: Clean up build artifacts
 echo "Cleaning up build artifacts..."
-rm -rf build dist "$EXECUTABLE_NAME.spec" config.txt
+rm -rf build dist "$EXECUTABLE_NAME.spec" config.txt config_py.py
 
 # Step 5: Verify the executable works
 echo "Verifying the new executable..."
@@ -0,0 +1,120 @@
+import tempfile
+import unittest
+
+from git import Repo
+
+from ai_code_review.git_io import (
+    _unquote_path, batch_hunks, compare_branches_numstat, is_cosmetic_change, split_hunk, split_unified_diff
+)
+
+FILE_HEADER = "--- a/f.py\n+++ b/f.py\n"
+# Six old and six new lines, three characters each
+HUNK = "@@ -10,6 +10,6 @@ f\n a\n-b\n+B\n c\n-d\n+D\n e\n f\n"
+
+class HunkBatchingTest(unittest.TestCase):
+    def test_split_hunk(self):
+        cases = [
+            ("fits unchanged", HUNK, 100, [HUNK]),
+            ("no parsable header", "@@ bogus\n" + " x\n" * 50, 20, ["@@ bogus\n" + " x\n" * 50]),
+            # Budget of 41 - 19 (header) - 16 (slack) = 6 characters, i.e. two lines per piece
+            ("renumbered pieces", HUNK, 41, [
+                "@@ -10,2 +10,1 @@ f\n a\n-b\n",
+                "@@ -12,1 +11,2 @@ f\n+B\n c\n",
+                "@@ -13,1 +13,1 @@ f\n-d\n+D\n",
+                "@@ -14,2 +14,2 @@ f\n e\n f\n",
+            ]),
+            ("no-newline marker counts on neither side", "@@ -1,2 +1,2 @@\n-a\n+b\n\\ No newline at end of file\n c\n", 30, [
+                "@@ -1,1 +1,0 @@\n-a\n",
+                "@@ -2,0 +1,1 @@\n+b\n\\ No newline at end of file\n",
+                "@@ -2,1 +2,1 @@\n c\n",
+            ]),
+        ]
+        for name, hunk, max_chars, expected in cases:
+            with self.subTest(name):
+                self.assertEqual(split_hunk(hunk, max_chars), expected)
+
+    def test_batch_hunks(self):
+        diff = FILE_HEADER + HUNK + "@@ -40,1 +40,1 @@\n-x\n+y\n"
+        cases = [
+            ("small diff stays whole", diff, 1000, [diff]),
+            # Hunks may use 63 - 22 (file header) = 41 characters, the two-line pieces from above
+            ("oversized hunk is split, every batch keeps the header", diff, len(FILE_HEADER) + 41, [
+                FILE_HEADER + "@@ -10,2 +10,1 @@ f\n a\n-b\n",
+                FILE_HEADER + "@@ -12,1 +11,2 @@ f\n+B\n c\n",
+                FILE_HEADER + "@@ -13,1 +13,1 @@ f\n-d\n+D\n",
+                FILE_HEADER + "@@ -14,2 +14,2 @@ f\n e\n f\n",
+                FILE_HEADER + "@@ -40,1 +40,1 @@\n-x\n+y\n",
+            ]),
+        ]
+        for name, file_diff, max_chars, expected in cases:
+            with self.subTest(name):
+                batches = batch_hunks(file_diff, max_chars)
+                self.assertEqual(batches, expected)
+                self.assertTrue(all(len(batch) <= max_chars for batch in batches))
+
+class CosmeticChangeTest(unittest.TestCase):
+    def test_is_cosmetic_change(self):
+        cases = [
+            ("no hunks: rename or mode change", "", True),
+            ("added blank lines", "@@ -1,2 +1,4 @@\n a\n+\n+   \n b\n", True),
+            ("trailing whitespace removed", "@@ -1,2 +1,2 @@\n-foo  \n+foo\n bar\n", True),
+            ("blank lines inside a change run", "@@ -1,2 +1,3 @@\n-a\n+\n+a\n b\n", True),
+            ("no-newline marker only", "@@ -1 +1 @@\n-a\n\\ No newline at end of file\n+a\n", True),
+            ("edited line", "@@ -1 +1 @@\n-a = 1\n+a = 2\n", False),
+            ("re-indented line", "@@ -1 +1 @@\n-a\n+  a\n", False),
+            ("swapped lines", "@@ -1,2 +1,2 @@\n-a\n-b\n+b\n+a\n", False),
+            ("use moved before its definition", "@@ -1,3 +1,3 @@\n-x = load()\n y = x.value\n+x = load()\n", False),
+            ("line moved to another hunk", "@@ -1,2 +1,1 @@\n-return 1\n a\n@@ -9,1 +9,2 @@\n b\n+return 1\n", False),
+            ("pure deletion", "@@ -1,2 +1,1 @@\n a\n-b\n", False),
+        ]
+        for name, hunks, expected in cases:
+            with self.subTest(name):
+                self.assertEqual(is_cosmetic_change(FILE_HEADER + hunks), expected)
+
+class QuotedPathTest(unittest.TestCase):
+    def test_unquote_path(self):
+        cases = [
+            ("plain path", "a/b.py", "a/b.py"),
+            ("unquoted non-ASCII", "café.py", "café.py"),
+            ("octal UTF-8 bytes", '"caf\\303\\251.py"', "café.py"),
+            ("tab and newline", '"ta\\tb\\n.py"', "ta\tb\n.py"),
+            ("quote and backslash", '"q\\"x\\\\y.py"', 'q"x\\y.py'),
+            ("lone quote", '"', '"'),
+        ]
+        for name, quoted, expected in cases:
+            with self.subTest(name):
+                self.assertEqual(_unquote_path(quoted), expected)
+
+    def test_split_unified_diff(self):
+        plain = "diff --git a/café.py b/café.py\n--- a/café.py\n+++ b/café.py\n@@ -1 +1 @@\n-a\n+b\n"
+        quoted = 'diff --git "a/ta\\tb.py" "b/ta\\tb.py"\n--- "a/ta\\tb.py"\n+++ "b/ta\\tb.py"\n@@ -1 +1 @@\n-c\n+d\n'
+        spaced = "diff --git a/my file.py b/my file.py\nnew file mode 100644\n"
+        cases = [
+            ("no diff", "", {}),
+            ("one file", plain, {"café.py": plain}),
+            ("quoted header", quoted, {"ta\tb.py": quoted}),
+            ("several files", plain + quoted + spaced, {"café.py": plain, "ta\tb.py": quoted, "my file.py": spaced}),
+        ]
+        for name, raw_diff, expected in cases:
+            with self.subTest(name):
+                self.assertEqual(split_unified_diff(raw_diff), expected)
+
+    def test_numstat_backend_keeps_special_paths(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            repo = Repo.init(tmp, initial_branch='main')
+            repo.git.config('user.email', 'test@example.com')
+            repo.git.config('user.name', 'test')
+            repo.git.commit('--allow-empty', '-m', 'base')
+            repo.git.checkout('-b', 'feature')
+            names = ['café.py', 'ta\tb.py', 'we*ird.py']
+            for name in names:
+                with open(f"{tmp}/{name}", 'w') as f:
+                    f.write("x = 1\n")
+            repo.git.add('--', *names)
+            repo.git.commit('-m', 'add')
+
+            self.assertEqual(sorted(compare_branches_numstat(repo, 'main', 'feature')), sorted(names))
+            repo.close()
+
+if __name__ == "__main__":
+    unittest.main()
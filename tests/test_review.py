@@ -0,0 +1,47 @@
+import unittest
+
+from ai_code_review.ollama_client import build_batch_prompt, split_batch_review
+from ai_code_review.review import store_review
+
+class BatchReviewTest(unittest.TestCase):
+    def test_split_batch_review(self):
+        cases = [
+            ("no markers", "1. Issue: x", {}),
+            ("two files", "=====FILE: a.py=====\n1. Issue: x\n=====FILE: b.py=====\nNo issues found\n",
+             {"a.py": "1. Issue: x", "b.py": "No issues found"}),
+            ("text before the first marker is dropped", "Sure:\n=====FILE: a.py=====\n1. Issue: x",
+             {"a.py": "1. Issue: x"}),
+            ("trailing spaces after the marker", "=====FILE: a.py=====  \n1. Issue: x", {"a.py": "1. Issue: x"}),
+        ]
+        for name, review, expected in cases:
+            with self.subTest(name):
+                self.assertEqual(split_batch_review(review), expected)
+
+    def test_prompt_markers_round_trip(self):
+        prompt = build_batch_prompt([("a.py", "diff a", None), ("b.py", "diff b", None)])
+        self.assertEqual(list(split_batch_review(prompt)), ["a.py", "b.py"])
+
+    def test_store_review(self):
+        label, targets = "a.py, b.py", [("a.py", 0), ("b.py", 0)]
+        cases = [
+            ("single target", "1. Issue: x", [("a.py", 0)], {"a.py": {0: "1. Issue: x"}, "b.py": {}}),
+            ("split per file", "=====FILE: a.py=====\n1. Issue: x\n=====FILE: b.py=====\nNo issues found",
+             targets, {"a.py": {0: "1. Issue: x"}, "b.py": {0: "No issues found"}}),
+            ("file missing from the reply", "=====FILE: a.py=====\n1. Issue: x",
+             targets, {"a.py": {0: "1. Issue: x"}, "b.py": {0: None}}),
+            ("no markers: kept under the batch", "1. Issue: x",
+             targets, {"a.py": {}, "b.py": {}, label: {0: "1. Issue: x"}}),
+            ("bare verdict", "No issues found", targets, {"a.py": {0: None}, "b.py": {0: None}}),
+            ("unmatched marker: kept under the batch", "=====FILE: ./a.py=====\n1. Issue: x\n=====FILE: b.py=====\nNo issues found",
+             targets, {"a.py": {0: None}, "b.py": {0: "No issues found"}, label: {0: "./a.py:\n1. Issue: x"}}),
+            ("clean unmatched marker is dropped", "=====FILE: ./a.py=====\nNo issues found",
+             targets, {"a.py": {0: None}, "b.py": {0: None}}),
+        ]
+        for name, review, review_targets, expected in cases:
+            with self.subTest(name):
+                reviews = {"a.py": {}, "b.py": {}}
+                store_review(reviews, label, review_targets, review)
+                self.assertEqual(reviews, expected)
+
+if __name__ == "__main__":
+    unittest.main()